@@ -1,11 +1,14 @@
 import logging
 import requests
+from requests.adapters import HTTPAdapter
 import os
 
 from typing import List, Union
 from datetime import datetime as _datetime
-import json
+import orjson
+import pickle
 import geopandas as gpd
+import pandas as pd
 
 from boson.http import serve
 from boson.boson_core_pb2 import Property
@@ -17,8 +20,25 @@ logger = logging.getLogger(__name__)
 logger.addHandler(logging.StreamHandler())
 logger.setLevel(logging.INFO)
 
+# TODO: Update the keys to match the API response
+LATIDUDE_KEY = "Latitude"
+LONGITUDE_KEY = "Longitude"
+ID_KEY = "id"
+DATETIME_KEY = "UTC"
+
+# Columns of the empty GeoDataFrame returned when there are no results
+EMPTY_GDF_COLUMNS = ["geometry", "id"]
+
 
 class APIWrapperRemoteProvider:
+    # No per-instance __dict__: attribute access goes through fixed slot
+    # offsets, and instances stay small if several providers are served
+    __slots__ = ("api_url", "max_page_size", "api_default_params", "_queryables", "session")
+
+    # Static queryables, shared across instances. Built lazily on the first
+    # queryables() call so Property construction stays off the import path.
+    _static_queryables = None
+
     def __init__(self) -> None:
         self.api_url = "api endpoint url goes here"
         self.max_page_size = 200
@@ -27,6 +47,14 @@ class APIWrapperRemoteProvider:
             "api_key": "api key goes here",
             "format": "json",
         }
+        # Cache for the queryables dict so it is only built (or read from disk) once
+        self._queryables = None
+        # Reuse one session across page requests so the connection to the API host
+        # is kept alive instead of re-established (TCP + TLS) on every page
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=10)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
 
     def parse_input_params(
         self,
@@ -46,111 +74,134 @@ class APIWrapperRemoteProvider:
         """
         Translate geodesic input parameters to API parameters. This function accepts the boson search function
         parameters and returns a dictionary (api_params) with the parameters to be used in the API request.
-        """
-        api_params = {}
 
+        Each parameter is translated by its handler in _PARAM_HANDLERS, so only the
+        parameters that were actually provided cost anything per request. TODO: Edit the
+        handlers below to fit the API.
         """
-        DEFAULTS: Add default parameters to the request. TODO: Edit these in the __init__ method.
-        """
-        if self.api_default_params:
-            api_params.update(self.api_default_params)
+        # DEFAULTS: Add default parameters to the request. TODO: Edit these in the __init__ method.
+        api_params = dict(self.api_default_params)
 
-        """
-        BBOX: Add the bbox to the request, if it was provided
-        """
-        if bbox:
-            logger.info(f"Input bbox: {bbox}")
-            api_params["bbox"] = bbox
-        else:
+        if not bbox:
             logger.info("No bbox provided")
 
+        provided = (
+            ("bbox", bbox),
+            ("datetime", datetime),
+            ("intersects", intersects),
+            ("collections", collections),
+            ("feature_ids", feature_ids),
+            ("filter", filter),
+            ("fields", fields),
+            ("sortby", sortby),
+        )
+        for name, value in provided:
+            if value:
+                self._PARAM_HANDLERS[name](self, value, api_params)
+
         """
-        DATETIME: datetimes are provided as a list of two timestamps. TODO: Convert to whatever the API expects
+        METHOD and PAGINATION: only sent if the API declares them as queryables.
         """
-        if datetime:
-            logger.info(f"Received datetime: {datetime}")
+        queryables = self.queryables()
+        if "method" in queryables:
+            logger.info("Received method: %s", method)
+            api_params["method"] = method
+        if "page" in queryables:
+            api_params["page"] = page
+        if "page_size" in queryables:
+            api_params["page_size"] = page_size
 
-            # Example of how to handle datetime for an API that expect startdate and enddate in YYYY-MM-DD format
-            api_params["startdate"] = datetime[0].strftime("%Y-%m-%d")
-            api_params["enddate"] = datetime[1].strftime("%Y-%m-%d")
+        return api_params
+
+    def _handle_bbox(self, bbox, api_params: dict) -> None:
+        """BBOX: Add the bbox to the request, if it was provided."""
+        logger.info("Input bbox: %s", bbox)
+        api_params["bbox"] = bbox
+
+    def _handle_datetime(self, datetime, api_params: dict) -> None:
+        """DATETIME: datetimes are provided as a list of two timestamps. TODO: Convert to whatever the API expects."""
+        logger.info("Received datetime: %s", datetime)
+
+        # Example of how to handle datetime for an API that expect startdate and enddate in YYYY-MM-DD format.
+        # Formatting the components directly skips strftime's format parsing and locale lookup
+        start, end = datetime[0], datetime[1]
+        api_params["startdate"] = f"{start.year:04d}-{start.month:02d}-{start.day:02d}"
+        api_params["enddate"] = f"{end.year:04d}-{end.month:02d}-{end.day:02d}"
 
+    def _handle_intersects(self, intersects, api_params: dict) -> None:
         """
         INTERSECTS: Handle provided geometry. Unless the API accepts a geometry, this will be difficult to implement.
         In this example, we replace the bbox parameter with the bounding box of the geometry. This will provide
-        some preliminary filtering, and then the results could be further filtered to fit the geometry after the 
+        some preliminary filtering, and then the results could be further filtered to fit the geometry after the
         features are returned.
         """
-        if intersects:
-            logger.info(
-                f"Received geometry from intersects keyword with bounds: {intersects.bounds}"
-            )
-            # Example: take the bounds of the geometry and use as bbox
-            bbox = intersects.bounds
-            api_params["bbox"] = bbox
+        logger.info(
+            "Received geometry from intersects keyword with bounds: %s", intersects.bounds
+        )
+        # Example: take the bounds of the geometry and use as bbox
+        api_params["bbox"] = intersects.bounds
 
-        """ 
-        COLLECTIONS: Handle collections, if applicable. Not implemented in this example.
-        """
-        if collections:
-            logger.info(f"Received collections: {collections}")
-            logger.info("Collections are not implemented here")
+    def _handle_collections(self, collections, api_params: dict) -> None:
+        """COLLECTIONS: Handle collections, if applicable. Not implemented in this example."""
+        logger.info("Received collections: %s", collections)
+        logger.info("Collections are not implemented here")
 
-        """
-        IDS: Handle ids
-        """
-        if feature_ids:
-            logger.info(f"Received ids of length: {len(feature_ids)}")
-            api_params["ids"] = feature_ids  # TODO: Update the key to match the API
+    def _handle_feature_ids(self, feature_ids, api_params: dict) -> None:
+        """IDS: Handle ids."""
+        logger.info("Received ids of length: %s", len(feature_ids))
+        api_params["ids"] = feature_ids  # TODO: Update the key to match the API
 
+    def _handle_filter(self, filter, api_params: dict) -> None:
         """
         FILTER: Handle CQL2 filters. The cql2_to_query_params function will convert the CQL2 filter to a dictionary
-            for cql filters with the "logical_and" and "eq" operators. The CQL filters are the way to pass api parameters to the
-            search function.
+        for cql filters with the "logical_and" and "eq" operators. The CQL filters are the way to pass api parameters
+        to the search function.
         """
-        if filter:
-            logger.info(f"Received CQL filter")
-            api_params.update(cql2_to_query_params(filter))
+        logger.info("Received CQL filter")
+        api_params.update(cql2_to_query_params(filter))
 
+    def _handle_fields(self, fields, api_params: dict) -> None:
         """
-        FIELDS:  list of fields to include/exclude. Included fields should be prefixed by 
-        "+" and excluded fields by "-". Alernatively, a dict with a "include"/"exclude" lists 
-        may be provided
-        """
-        if fields:
-            logger.info(f"Received fields: {fields}")
-            if isinstance(fields, dict):
-                include = fields.get("include", [])
-                exclude = fields.get("exclude", [])
-            else:
-                include = [field for field in fields if field[0] == "+"]
-                exclude = [field for field in fields if field[0] == "-"]
-            # Example API has only exclude parameter TODO: Edit this to fit the API
-            api_params["exclude_columns"] = exclude
-
+        FIELDS: list of fields to include/exclude. Included fields should be prefixed by
+        "+" and excluded fields by "-". Alernatively, a dict with a "include"/"exclude" lists
+        may be provided.
         """
-        SORTBY: Handle sorting. Sortby is a dict containing “field” and “direction”. 
-        Direction may be one of “asc” or “desc”. Not supported by all datasets
-        """
-        if sortby:
-            logger.info(f"Received sortby: {sortby}")
-            api_params["sort"] = sortby.get("direction", "asc")
-
-        """
-        METHOD: Handle the method. This is the HTTP method to use for the request.
-        """
-        if "method" in self.queryables():
-            logger.info(f"Received method: {method}")
-            api_params["method"] = method
-
-        """
-        PAGINATION: Handle pagination (page and page_size)
-        """
-        if "page" in self.queryables():
-            api_params["page"] = page
-        if "page_size" in self.queryables():
-            api_params["page_size"] = page_size
-
-        return api_params
+        logger.info("Received fields: %s", fields)
+        if isinstance(fields, dict):
+            include = fields.get("include", [])
+            exclude = fields.get("exclude", [])
+        else:
+            # Single pass over the fields; startswith also avoids an
+            # IndexError on an empty field string
+            include, exclude = [], []
+            for field in fields:
+                if field.startswith("+"):
+                    include.append(field)
+                elif field.startswith("-"):
+                    exclude.append(field)
+        # Example API has only exclude parameter TODO: Edit this to fit the API
+        api_params["exclude_columns"] = exclude
+
+    def _handle_sortby(self, sortby, api_params: dict) -> None:
+        """
+        SORTBY: Handle sorting. Sortby is a dict containing “field” and “direction”.
+        Direction may be one of “asc” or “desc”. Not supported by all datasets.
+        """
+        logger.info("Received sortby: %s", sortby)
+        api_params["sort"] = sortby.get("direction", "asc")
+
+    # Dispatch table mapping search parameters to their handlers, built once at
+    # class creation
+    _PARAM_HANDLERS = {
+        "bbox": _handle_bbox,
+        "datetime": _handle_datetime,
+        "intersects": _handle_intersects,
+        "collections": _handle_collections,
+        "feature_ids": _handle_feature_ids,
+        "filter": _handle_filter,
+        "fields": _handle_fields,
+        "sortby": _handle_sortby,
+    }
 
     def convert_results_to_gdf(self, response: Union[dict, List[dict]]) -> gpd.GeoDataFrame:
         """
@@ -166,33 +217,34 @@ class APIWrapperRemoteProvider:
             response = response.get("results", [])
 
         logger.info("Converting API response to GeoDataFrame.")
-        logger.info(f"Received {len(response)} results. Converting to GeoDataFrame.")
+        logger.info("Received %s results. Converting to GeoDataFrame.", len(response))
         if len(response) == 0:
-            return gpd.GeoDataFrame(columns=["geometry", "id"])
-
-        logger.info(f"First result: {response[0]}")
-
-        # TODO: Update the keys to match the API response
-        LATIDUDE_KEY = "Latitude"
-        LONGITUDE_KEY = "Longitude"
-        ID_KEY = "id"
-        DATETIME_KEY = "UTC"
-
+            return gpd.GeoDataFrame(columns=EMPTY_GDF_COLUMNS)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("First result: %r", response[0])
+
+        # Build the frame in one shot and let points_from_xy work on the columns directly
+        # (numpy arrays) rather than building intermediate Python lists
+        df = pd.DataFrame(response)
+        # Move the id column to the index up front; a set_index after the fact
+        # reorganizes every column's blocks
+        df.index = pd.Index(df.pop(ID_KEY), name=ID_KEY)
+        # Coerce the coordinate columns to contiguous float64 arrays so
+        # points_from_xy gets typed input even if the API returned the
+        # coordinates as strings or mixed types
         gdf = gpd.GeoDataFrame(
-            response,
+            df,
             geometry=gpd.points_from_xy(
-                [obs.get(LONGITUDE_KEY) for obs in response],
-                [obs.get(LATIDUDE_KEY) for obs in response],
+                df[LONGITUDE_KEY].to_numpy(dtype="float64"),
+                df[LATIDUDE_KEY].to_numpy(dtype="float64"),
             ),
         )
 
-        gdf.set_index(ID_KEY, inplace=True)
-
         # TODO: update datetime format
         gdf["datetime"] = (
-            gdf[DATETIME_KEY]
-            .apply(lambda x: _datetime.strptime(x, format="%Y-%m-%dT%H:%M"))
-            .astype(str)
+            pd.to_datetime(gdf[DATETIME_KEY], format="%Y-%m-%dT%H:%M", cache=True)
+            .dt.strftime("%Y-%m-%dT%H:%M:%S")
         )
 
         return gdf
@@ -203,35 +255,36 @@ class APIWrapperRemoteProvider:
         modification.
         """
         # Translate the input parameters to API parameters
-        logger.info(f"Parsing search input parameters: {kwargs}")
+        logger.debug("Parsing search input parameters: %s", kwargs)
         api_params = self.parse_input_params(**kwargs)
 
-        # Make a GET request to the API
-        logger.info(f"Making request with params: {api_params}")
-        response = requests.get(self.api_url, api_params)
+        # Make a GET request to the API on the pooled session
+        logger.info("Making request with params: %s", api_params)
+        response = self.session.get(self.api_url, params=api_params, timeout=30)
 
         # Check if the request was successful (status code 200)
         if response.status_code == 200:
-            # Parse and use the response data (JSON in this case)
-            res = response.json()
+            # Parse the response body directly from bytes; orjson skips the
+            # intermediate str decode that response.json() pays for
+            res = orjson.loads(response.content)
 
             # Check if the response is empty
             if not res:
                 logger.info("No results returned from API")
-                gdf = gpd.GeoDataFrame(columns=["geometry", "id"])
+                return gpd.GeoDataFrame(columns=EMPTY_GDF_COLUMNS)
 
             gdf = self.convert_results_to_gdf(res)
-            logger.info(f"Received {len(gdf)} features")
+            logger.info("Received %s features", len(gdf))
         else:
-            logging.error(f"Error: {response.status_code}")
-            gdf = gpd.GeoDataFrame(columns=["geometry", "id"])
+            logging.error("Error: %s", response.status_code)
+            gdf = gpd.GeoDataFrame(columns=EMPTY_GDF_COLUMNS)
 
         return gdf
 
     def search(self, pagination={}, provider_properties={}, **kwargs) -> gpd.GeoDataFrame:
         """Implements the Boson Search endpoint."""
         logger.info("Making request to API.")
-        logger.info(f"Search received kwargs: {kwargs}")
+        logger.debug("Search received kwargs: %s", kwargs)
 
         """
         PAGINATION and LIMIT: if limit is None, Boson will page through all results. Set a max
@@ -239,18 +292,13 @@ class APIWrapperRemoteProvider:
         will return that number of results. Pagination is a dictionary with the keys "page" and "page_size".
         We will pass "page" and "page_size" to the request_features function.
         """
+        limit = kwargs.get("limit") or None
+        page_size = min(limit, self.max_page_size) if limit else self.max_page_size
         page = 1
-        page_size = self.max_page_size
-        limit = kwargs.get("limit", None)
-        if limit == 0:
-            limit = None
-        if limit is not None:
-            page_size = limit if limit <= self.max_page_size else self.max_page_size
-
         if pagination:
-            logger.info(f"Received pagination: {pagination}")
-            page = pagination.get("page", None)
-            page_size = pagination.get("page_size", self.max_page_size)
+            logger.info("Received pagination: %s", pagination)
+            page = pagination.get("page", 1)
+            page_size = pagination.get("page_size", page_size)
 
         """
         PROVIDER_PROPERTIES: These are the properties set in the boson_config.properties. These are an
@@ -258,7 +306,8 @@ class APIWrapperRemoteProvider:
         """
         if provider_properties:
             logger.info(
-                f"Received provider_properties from boson_config.properties: {provider_properties}"
+                "Received provider_properties from boson_config.properties: %s",
+                provider_properties,
             )
             # TODO: Update kwargs with relevant keys from provider_properties, or otherwise pass them along
 
@@ -274,14 +323,31 @@ class APIWrapperRemoteProvider:
         This method is used to automatically generate the queryables from an openapi file. Manually entering the
         queryyables is laborious. If the external API provides and OpenAPI spec, this method will read it from
         a json file and return the queryables automatically. (credit: Mark Schulist)
-        """
-        with open(openapi_path, "r") as f:  # loading locally because more speedy
-            response = json.load(f)
-        queryables = {}
 
+        The parameter list is cached in a pickle next to the OpenAPI file, so the (possibly
+        large) spec is only parsed the first time. Delete the .queryables.pkl to force a
+        rebuild. The Property objects themselves are rebuilt each load since generated
+        protobuf messages don't pickle reliably.
+        """
         path = "/occurrence/search"  # TODO: Update with path for your API
 
-        params = response["paths"][path]["get"]["parameters"]
+        cache_path = openapi_path + ".queryables.pkl"
+        if os.path.isfile(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(
+            openapi_path
+        ):
+            with open(cache_path, "rb") as f:
+                params = pickle.load(f)
+        else:
+            with open(openapi_path, "rb") as f:  # loading locally because more speedy
+                response = orjson.loads(f.read())
+            params = response["paths"][path]["get"]["parameters"]
+            # Write the cache atomically so an interrupted dump can't leave a
+            # truncated pickle behind
+            with open(cache_path + ".tmp", "wb") as f:
+                pickle.dump(params, f)
+            os.replace(cache_path + ".tmp", cache_path)
+
+        queryables = {}
 
         for param in params:
             title = param.get("name")
@@ -304,13 +370,20 @@ class APIWrapperRemoteProvider:
         Update this method to return a dictionary of queryable parameters that the API accepts.
         The keys should be the parameter names. The values should be a Property object that follows
         the conventions of JSON Schema.
+
+        The result is cached on the instance since the queryables don't change between requests.
         """
+        if self._queryables is not None:
+            return self._queryables
+
         # if you have an openapi file, you can use the get_queryables_from_openapi method
         # to automatically generate the queryables
         if os.path.isfile("path_to_openapi_file"):
-            return self.get_queryables_from_openapi(openapi_path="path_to_openapi_file")
+            self._queryables = self.get_queryables_from_openapi(openapi_path="path_to_openapi_file")
+        elif APIWrapperRemoteProvider._static_queryables is not None:
+            self._queryables = APIWrapperRemoteProvider._static_queryables
         else:
-            return {
+            self._queryables = APIWrapperRemoteProvider._static_queryables = {
                 "example_parameter": Property(
                     title="parameter_title",
                     type="string",
@@ -333,6 +406,7 @@ class APIWrapperRemoteProvider:
                     type="boolean",
                 ),
             }
+        return self._queryables
 
 
 api_wrapper = APIWrapperRemoteProvider()